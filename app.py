@@ -1,28 +1,83 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 from pyserini.search.lucene import LuceneSearcher
-import json
+import orjson
+from ranking import top_n_positions
 
 DATA_DIR = "data"
 INDEX_DIR = "indices/recipes_lucene"
+SENTIMENT_CSV = os.path.join(DATA_DIR, "recipes_sentiment.csv")
+SENTIMENT_PARQUET = os.path.join(DATA_DIR, "recipes_sentiment.parquet")
 
 st.set_page_config(page_title="Recipe Search", layout="wide")
 
-@st.cache_data
-def load_data():
-    path = os.path.join(DATA_DIR, "recipes_sentiment.csv")
-    if os.path.exists(path):
-        return pd.read_csv(path)
+GROUP_COLS = ['cuisine_type', 'primary_dietary', 'sentiment_label']
+_READ_COLS = ['title', 'sentiment_label', 'sentiment_polarity', 'cuisine_type', 'primary_dietary']
+
+def source_mtime():
+    if os.path.exists(SENTIMENT_CSV):
+        return os.path.getmtime(SENTIMENT_CSV)
     return None
 
+@st.cache_data(persist='disk')
+def load_data(csv_mtime):
+    # csv_mtime is part of the cache key, so regenerating the CSV invalidates the disk cache and the Parquet copy
+    if csv_mtime is None:
+        return None, None, None
+    if os.path.exists(SENTIMENT_PARQUET) and os.path.getmtime(SENTIMENT_PARQUET) >= csv_mtime:
+        df = pd.read_parquet(SENTIMENT_PARQUET)
+    else:
+        df = pd.read_csv(SENTIMENT_CSV, engine='pyarrow', usecols=_READ_COLS)
+        for col in GROUP_COLS:
+            df[col] = df[col].astype('category')
+        df.to_parquet(SENTIMENT_PARQUET, compression='zstd')
+    # Polarity sum/count per (cuisine, diet, sentiment) cell; filtered charts are rolled up from these
+    groups = df.groupby(GROUP_COLS, observed=True)['sentiment_polarity'].agg(['sum', 'count', 'size'])
+    # Search hits are matched by title; keep the first recipe per title like the old row scan did
+    by_title = df.drop_duplicates('title', keep='first').set_index('title')
+    return df, groups, by_title
+
+@st.cache_data
+def sentiment_summary(_groups, data_version, cuisine_filter, diet_filter, sent_filter):
+    # _groups is not hashed; data_version (the CSV mtime) keys the cache to the data it came from
+    keep = np.ones(len(_groups), dtype=bool)
+    if cuisine_filter != 'All':
+        keep &= _groups.index.get_level_values('cuisine_type') == cuisine_filter
+    if diet_filter != 'All':
+        keep &= _groups.index.get_level_values('primary_dietary') == diet_filter
+    if sent_filter != 'All':
+        keep &= _groups.index.get_level_values('sentiment_label') == sent_filter.lower()
+    cells = _groups[keep]
+    
+    by_cuisine = cells.groupby(level='cuisine_type', observed=True).sum()
+    by_diet = cells.groupby(level='primary_dietary', observed=True).sum()
+    by_sentiment = cells.groupby(level='sentiment_label', observed=True).sum()
+    return (
+        (by_cuisine['sum'] / by_cuisine['count']).sort_values(ascending=False),
+        (by_diet['sum'] / by_diet['count']).sort_values(ascending=False),
+        by_cuisine['size'].sort_values(ascending=False),
+        by_sentiment['size'].sort_values(ascending=False),
+    )
+
 @st.cache_resource
 def load_searcher():
     if os.path.exists(INDEX_DIR):
         return LuceneSearcher(INDEX_DIR)
     return None
 
-df = load_data()
+@st.cache_data(ttl=120)
+def run_query(_searcher, query, k):
+    _searcher.set_bm25(k1=0.9, b=0.4)
+    results = []
+    for hit in _searcher.search(query, k=k):
+        doc = orjson.loads(_searcher.doc(hit.docid).raw())
+        results.append((hit.docid, hit.score, doc.get('title') or 'No title', doc.get('ingredients') or ''))
+    return results
+
+csv_mtime = source_mtime()
+df, groups, by_title = load_data(csv_mtime)
 searcher = load_searcher()
 
 st.title("Recipe Search & Sentiment Analysis")
@@ -39,29 +94,22 @@ with search_tab:
         num_results = st.slider("Number of results", 5, 50, 10)
         
         if query:
-            searcher.set_bm25(k1=0.9, b=0.4)
-            results = searcher.search(query, k=num_results)
+            results = run_query(searcher, query, num_results)
             
             st.write(f"Found {len(results)} recipes")
             
-            for rank, result in enumerate(results, 1):
-                doc = json.loads(searcher.doc(result.docid).raw())
-                title = doc.get('title', 'No title')
-                ingredients = doc.get('ingredients', '')
-                
-                with st.expander(f"{rank}. {title} - Score: {result.score:.3f}"):
+            for rank, (docid, score, title, ingredients) in enumerate(results, 1):
+                with st.expander(f"{rank}. {title} - Score: {score:.3f}"):
                     st.write(f"Ingredients: {ingredients[:200]}...")
                     
-                    if df is not None:
-                        match = df[df['title'] == title]
-                        if not match.empty:
-                            recipe_data = match.iloc[0]
-                            
-                            col_sentiment = st.columns(4)
-                            col_sentiment[0].metric("Sentiment", recipe_data['sentiment_label'])
-                            col_sentiment[1].metric("Score", f"{recipe_data['sentiment_polarity']:.2f}")
-                            col_sentiment[2].metric("Cuisine", recipe_data['cuisine_type'])
-                            col_sentiment[3].metric("Diet", recipe_data['primary_dietary'])
+                    if by_title is not None and title in by_title.index:
+                        recipe_data = by_title.loc[title]
+                        
+                        col_sentiment = st.columns(4)
+                        col_sentiment[0].metric("Sentiment", recipe_data['sentiment_label'])
+                        col_sentiment[1].metric("Score", f"{recipe_data['sentiment_polarity']:.2f}")
+                        col_sentiment[2].metric("Cuisine", recipe_data['cuisine_type'])
+                        col_sentiment[3].metric("Diet", recipe_data['primary_dietary'])
 
 with sentiment_tab:
     st.header("Sentiment Analysis")
@@ -84,21 +132,26 @@ with sentiment_tab:
         st.subheader("Filter")
         col_cuisine, col_diet, col_sentiment = st.columns(3)
         
-        cuisines = ['All'] + sorted(df['cuisine_type'].unique().tolist())
+        cuisines = ['All'] + sorted(df['cuisine_type'].cat.categories.tolist())
         cuisine_filter = col_cuisine.selectbox("Cuisine", cuisines)
         
-        diets = ['All'] + sorted(df['primary_dietary'].unique().tolist())
+        diets = ['All'] + sorted(df['primary_dietary'].cat.categories.tolist())
         diet_filter = col_diet.selectbox("Diet", diets)
         
         sent_filter = col_sentiment.selectbox("Sentiment", ['All', 'Positive', 'Neutral', 'Negative'])
         
-        filtered = df.copy()
+        mask = np.ones(len(df), dtype=bool)
         if cuisine_filter != 'All':
-            filtered = filtered[filtered['cuisine_type'] == cuisine_filter]
+            mask &= df['cuisine_type'].values == cuisine_filter
         if diet_filter != 'All':
-            filtered = filtered[filtered['primary_dietary'] == diet_filter]
+            mask &= df['primary_dietary'].values == diet_filter
         if sent_filter != 'All':
-            filtered = filtered[filtered['sentiment_label'] == sent_filter.lower()]
+            mask &= df['sentiment_label'].values == sent_filter.lower()
+        filtered = df[mask]
+        
+        by_cuisine, by_diet, counts, sent_counts = sentiment_summary(
+            groups, csv_mtime, cuisine_filter, diet_filter, sent_filter
+        )
         
         st.info(f"Showing {len(filtered):,} recipes")
         
@@ -108,14 +161,10 @@ with sentiment_tab:
         
         with col_cuisine_chart:
             st.subheader("Sentiment by Cuisine")
-            by_cuisine = filtered.groupby('cuisine_type')['sentiment_polarity'].mean()
-            by_cuisine = by_cuisine.sort_values(ascending=False)
             st.bar_chart(by_cuisine)
         
         with col_diet_chart:
             st.subheader("Sentiment by Diet")
-            by_diet = filtered.groupby('primary_dietary')['sentiment_polarity'].mean()
-            by_diet = by_diet.sort_values(ascending=False)
             st.bar_chart(by_diet)
         
         st.markdown("---")
@@ -124,18 +173,17 @@ with sentiment_tab:
         
         with col_counts:
             st.subheader("Recipe Counts")
-            counts = filtered['cuisine_type'].value_counts()
             st.bar_chart(counts)
         
         with col_distribution:
             st.subheader("Sentiment Split")
-            sent_counts = filtered['sentiment_label'].value_counts()
             st.bar_chart(sent_counts)
         
         st.markdown("---")
         st.subheader("Most Positive Recipes")
         
-        top = filtered.nlargest(10, 'sentiment_polarity')
+        # Same selection as the CLI report, so tied recipes come out in the same order
+        top = filtered.iloc[top_n_positions(filtered['sentiment_polarity'].to_numpy(), 10)]
         for idx, row in top.iterrows():
             with st.expander(f"{row['title']} ({row['sentiment_polarity']:.3f})"):
                 st.write(f"Cuisine: {row['cuisine_type']}")
@@ -1,3 +1,4 @@
+import os
 import json
 from pyserini.search.lucene import LuceneSearcher
 
@@ -5,26 +6,24 @@ searcher = LuceneSearcher("indices/recipes_lucene")
 searcher.set_bm25(k1=0.9, b=0.4)
 
 queries = open("data/recipes/recipes-queries.txt").read().strip().split('\n')
+qids = [str(i) for i in range(1, len(queries) + 1)]
+hits_map = searcher.batch_search(queries, qids, k=10, threads=os.cpu_count() or 1)
 
-with open("data/recipes/recipes-qrels.txt", 'w') as f:
-    for i, query in enumerate(queries, 1):
-        hits = searcher.search(query, k=10)
-        for rank, hit in enumerate(hits[:10]):
+# The same documents come back for many queries, so parse each title once
+title_cache = {}
+
+lines = []
+for qid, query in zip(qids, queries):
+    # Simple relevance if query words appear in title
+    query_words = set(query.lower().split())
+    for hit in hits_map[qid][:10]:
+        if hit.docid not in title_cache:
             doc = json.loads(searcher.doc(hit.docid).raw())
-            title = doc.get('title', '').lower()
-            query_lower = query.lower()
-            
-            # Simple relevance if query words appear in title
-            query_words = set(query_lower.split())
-            title_words = set(title.split())
-            overlap = len(query_words & title_words)
-            
-            # 2 = 2+ words match, 1 = 1 word matches, 0 = no match
-            if overlap >= 2:
-                rel = 2
-            elif overlap >= 1:
-                rel = 1
-            else:
-                rel = 0
-            
-            f.write(f"{i} {hit.docid} {rel}\n")
+            title_cache[hit.docid] = set((doc.get('title') or '').lower().split())
+        
+        # 2 = 2+ words match, 1 = 1 word matches, 0 = no match
+        rel = min(len(query_words & title_cache[hit.docid]), 2)
+        lines.append(f"{qid} {hit.docid} {rel}\n")
+
+with open("data/recipes/recipes-qrels.txt", 'w') as f:
+    f.write(''.join(lines))
@@ -1,13 +1,25 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
-from collections import Counter
-import ast
 import os
+from recipe_preprocessing import parse_list
+
+_READ_COLS = ['title', 'directions', 'NER', 'source', 'site', 'link']
+
+
+def _plot_histogram(ax, series, bins, color):
+    # Bin with numpy once and draw the bars directly instead of going through ax.hist
+    counts, edges = np.histogram(series.dropna().to_numpy(), bins=bins)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', edgecolor='black', alpha=0.7, color=color)
 
 class RecipeExplorer:
     def __init__(self, data_path: str, sample_size: int = 50000):
         print(f"Loading {sample_size:,} recipes from {data_path}")
-        self.df = pd.read_csv(data_path, nrows=sample_size)
+        # pyarrow engine has no nrows support; project columns on the C engine instead
+        self.df = pd.read_csv(data_path, nrows=sample_size, usecols=lambda c: c in _READ_COLS)
+        for col in ('source', 'site'):
+            if col in self.df.columns:
+                self.df[col] = self.df[col].astype('category')
         print(f"Loaded {len(self.df):,} recipes")
     
     def stats(self):
@@ -45,14 +57,10 @@ class RecipeExplorer:
         print("\nDirections length statistics:")
         print(self.df['directions_len'].describe())
         
-        def count_ingredients(ner_field):
-            try:
-                parsed = ast.literal_eval(str(ner_field))
-                return len(parsed) if isinstance(parsed, list) else 0
-            except:
-                return 0
-        
-        self.df['ingredient_count'] = self.df['NER'].apply(count_ingredients)
+        self.df['ingredient_count'] = (
+            self.df['NER'].fillna('[]').astype(str).map(parse_list)
+            .str.len().fillna(0).astype(int)
+        )
         print("Ingredient count statistics:")
         print(self.df['ingredient_count'].describe())
     
@@ -62,7 +70,7 @@ class RecipeExplorer:
             print(f"\nRecipe {idx + 1}:")
             print(f"Title: {recipe['title']}")
             
-            ingredients = ast.literal_eval(str(recipe['NER']))
+            ingredients = parse_list(str(recipe['NER'])) or []
             print(f"Ingredients ({len(ingredients)}): {', '.join(ingredients[:5])}")
             
             print(f"Directions: {str(recipe['directions'])[:200]}")
@@ -70,22 +78,15 @@ class RecipeExplorer:
     
     def ingredient_analysis(self, top_n: int = 20):
         print("Top ingredients analysis")
-        all_ingredients = []
-        for ner_field in self.df['NER']:
-            try:
-                parsed = ast.literal_eval(str(ner_field))
-                if isinstance(parsed, list):
-                    all_ingredients.extend([ing.lower().strip() for ing in parsed])
-            except:
-                continue
-        
-        ingredient_counts = Counter(all_ingredients)
+        # Non-string entries and unparseable rows become NaN and drop out of value_counts
+        ingredients = self.df['NER'].fillna('[]').astype(str).map(parse_list).explode()
+        ingredient_counts = ingredients.str.lower().str.strip().value_counts()
         print("\nMost common ingredients:")
-        for ingredient, count in ingredient_counts.most_common(top_n):
+        for ingredient, count in ingredient_counts.head(top_n).items():
             pct = (count / len(self.df)) * 100
             print(f"{ingredient:.<30} {count:>6,} recipes ({pct:.1f}%)")
     
-    def create_visualizations(self, output_dir: str = "."):
+    def create_visualizations(self, output_dir: str = ".", dpi: int = 150):
         print("Creating visualizations")
         os.makedirs(output_dir, exist_ok=True)
         
@@ -102,7 +103,7 @@ class RecipeExplorer:
             axes_flat = axes
         
         # Title length distribution
-        axes_flat[0].hist(self.df['title_len'], bins=50, edgecolor='black', alpha=0.7, color='steelblue')
+        _plot_histogram(axes_flat[0], self.df['title_len'], bins=50, color='steelblue')
         axes_flat[0].set_xlabel('Title Length (characters)')
         axes_flat[0].set_ylabel('Frequency')
         axes_flat[0].set_title('Distribution of Recipe Title Lengths')
@@ -112,7 +113,7 @@ class RecipeExplorer:
         
         # Ingredient count distribution
         ingredient_95th = self.df['ingredient_count'].quantile(0.95)
-        axes_flat[1].hist(self.df['ingredient_count'], bins=30, edgecolor='black', alpha=0.7, color='seagreen')
+        _plot_histogram(axes_flat[1], self.df['ingredient_count'], bins=30, color='seagreen')
         axes_flat[1].set_xlabel('Number of Ingredients')
         axes_flat[1].set_ylabel('Frequency')
         axes_flat[1].set_title('Distribution of Ingredient Counts')
@@ -121,7 +122,7 @@ class RecipeExplorer:
         axes_flat[1].legend()
         axes_flat[1].grid(alpha=0.3)
         
-        axes_flat[2].hist(self.df['directions_len'], bins=50, edgecolor='black', alpha=0.7, color='coral')
+        _plot_histogram(axes_flat[2], self.df['directions_len'], bins=50, color='coral')
         axes_flat[2].set_xlabel('Directions Length (characters)')
         axes_flat[2].set_ylabel('Frequency')
         axes_flat[2].set_title('Distribution of Recipe Directions Lengths')
@@ -132,7 +133,7 @@ class RecipeExplorer:
         
         plt.tight_layout()
         output_path = os.path.join(output_dir, "recipe_exploration.png")
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
+        plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
         print(f"\nVisualization saved to: {output_path}")
         plt.close()
     
@@ -146,16 +147,19 @@ class RecipeExplorer:
         
         print("Completed")
 
-def main():
-    DATA_PATH = "data/recipes_data.csv"
-    
-    if not os.path.exists(DATA_PATH):
+def run(data_path="data/recipes_data.csv", sample_size=50000):
+    if not os.path.exists(data_path):
         print("Data file not found")
-        print(f"Please place recipes_data.csv at: {DATA_PATH}")
-        return
+        print(f"Please place recipes_data.csv at: {data_path}")
+        return False
     
-    explorer = RecipeExplorer(DATA_PATH, sample_size=50000)
+    explorer = RecipeExplorer(data_path, sample_size=sample_size)
     explorer.run_full_exploration()
+    return True
+
+
+def main():
+    run()
 
 
 if __name__ == "__main__":
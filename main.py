@@ -1,7 +1,7 @@
 import os
 import argparse
-import subprocess
 import json
+import traceback
 
 class RecipeRetrievalPipeline:
     def __init__(self, config):
@@ -11,48 +11,65 @@ class RecipeRetrievalPipeline:
     def print_header(self, title):
         print(f"{title}")
     
-    def run_command(self, description, command):
+    def run_in_process(self, description, func, **kwargs):
+        # Steps share one interpreter, so imports and the Pyserini JVM load only once
         print(f"\n{description}")
-        print(f"Running: {' '.join(command)}")
+        print(f"Running: {func.__module__}.{func.__name__}")
         
         try:
-            subprocess.run(command, check=True, capture_output=False)
-            print(f"{description} complete\n")
-            return True
-        except subprocess.CalledProcessError as e:
+            ok = func(**kwargs)
+        except Exception:
             print(f"Error in {description}")
-            print(f"{e}")
+            # The full stack trace, as a failing subprocess step used to print
+            traceback.print_exc()
             return False
-        except FileNotFoundError:
-            print(f"Script not found: {command[1]}")
+        
+        if not ok:
+            print(f"Error in {description}")
             return False
+        print(f"{description} complete\n")
+        return True
     
     def step1_preprocess(self):
         self.print_header("STEP 1: Data Preprocessing")
-        return self.run_command(
-            "Preprocessing raw recipe data",
-            ['python', 'recipe_preprocessing.py']
+        from recipe_preprocessing import run
+        return self.run_in_process(
+            "Preprocessing raw recipe data", run,
+            input_file=self.config['raw_data'],
+            output_file=self.config['processed_data'],
         )
     
     def step2_explore(self):
         self.print_header("STEP 2: Data Exploration")
-        return self.run_command(
-            "Exploring dataset",
-            ['python', 'explore_data.py']
+        from explore_data import run
+        return self.run_in_process(
+            "Exploring dataset", run,
+            data_path=self.config['raw_data'],
         )
     
     def step3_prepare_pyserini(self):
         self.print_header("STEP 3: Prepare Data for Pyserini")
-        return self.run_command(
-            "Converting recipes to Pyserini format",
-            ['python', 'prepare_recipe.py']
+        from prepare_recipe import run
+        return self.run_in_process(
+            "Converting recipes to Pyserini format", run,
+            recipes_csv=self.config['processed_data'],
+            corpus_dir=self.config['corpus_dir'],
+            queries_file=self.config['queries_file'],
+            qrels_file=self.config['qrels_file'],
         )
     
     def step4_search(self):
         self.print_header("STEP 4: Build Index & Run Search")
-        return self.run_command(
-            "Running search and evaluation",
-            ['python', 'search_recipe.py']
+        return self.run_search("Running search and evaluation")
+    
+    def run_search(self, description):
+        from search_recipe import run
+        return self.run_in_process(
+            description, run,
+            corpus_dir=self.config['corpus_dir'],
+            index_dir=self.config['index_dir'],
+            queries_file=self.config['queries_file'],
+            qrels_file=self.config['qrels_file'],
         )
     
     def step5_label_qrels(self):
@@ -75,21 +92,23 @@ class RecipeRetrievalPipeline:
             searcher.set_bm25(k1=0.9, b=0.4)
             
             queries = open(queries_file).read().strip().split('\n')
+            qids = [str(i) for i in range(1, len(queries) + 1)]
+            hits_map = searcher.batch_search(queries, qids, k=10, threads=os.cpu_count() or 1)
+            title_cache = {}
             
-            with open(qrels_file, 'w') as f:
-                for i, query in enumerate(queries, 1):
-                    hits = searcher.search(query, k=10)
-                    for hit in hits[:10]:
+            lines = []
+            for qid, query in zip(qids, queries):
+                query_words = set(query.lower().split())
+                for hit in hits_map[qid][:10]:
+                    if hit.docid not in title_cache:
                         doc = json.loads(searcher.doc(hit.docid).raw())
-                        title = doc.get('title', '').lower()
-                        query_lower = query.lower()
-                        
-                        query_words = set(query_lower.split())
-                        title_words = set(title.split())
-                        overlap = len(query_words & title_words)
-                        
-                        rel = 2 if overlap >= 2 else (1 if overlap >= 1 else 0)
-                        f.write(f"{i} {hit.docid} {rel}\n")
+                        title_cache[hit.docid] = set((doc.get('title') or '').lower().split())
+                    
+                    rel = min(len(query_words & title_cache[hit.docid]), 2)
+                    lines.append(f"{qid} {hit.docid} {rel}\n")
+            
+            with open(qrels_file, 'w') as f:
+                f.write(''.join(lines))
             
             print(f"Auto-generated qrels for {len(queries)} queries")
             print(f"Saved to: {qrels_file}")
@@ -113,16 +132,15 @@ class RecipeRetrievalPipeline:
         
         print(f"Found {num_labels} relevance judgments\n")
         
-        return self.run_command(
-            "Final evaluation with labeled qrels",
-            ['python', 'search_recipe.py']
-        )
+        return self.run_search("Final evaluation with labeled qrels")
         
     def step7_sentiment_analysis(self):
         self.print_header("STEP 7: Sentiment Analysis")
-        return self.run_command(
-            "Running sentiment analysis",
-            ['python', 'sentiment.py']
+        from sentiment import run
+        return self.run_in_process(
+            "Running sentiment analysis", run,
+            input_file=self.config['processed_data'],
+            output_file=self.config['sentiment_data'],
         )
     
     def run_full_pipeline(self):
@@ -155,6 +173,7 @@ class RecipeRetrievalPipeline:
             4: self.step4_search,
             5: self.step5_label_qrels,
             6: self.step6_final_eval,
+            7: self.step7_sentiment_analysis,
         }
         
         if step_num not in steps:
@@ -175,6 +194,7 @@ def main():
     config = {
         'raw_data': 'data/recipes_data.csv',
         'processed_data': 'data/recipes_processed.csv',
+        'sentiment_data': 'data/recipes_sentiment.csv',
         'corpus_dir': 'data/recipes/corpus',
         'queries_file': 'data/recipes/recipes-queries.txt',
         'qrels_file': 'data/recipes/recipes-qrels.txt',
@@ -1,24 +1,38 @@
 import pandas as pd
-import json
+import orjson
 import os
 from tqdm import tqdm
 
+_READ_COLS = ['document', 'title', 'ner_text']
+
 
 def create_corpus(input_file, output_dir):
     print("Loading recipes")
-    df = pd.read_csv(input_file)
+    # The pyarrow engine rejects usecols that are not in the file, so match them to the header
+    header = pd.read_csv(input_file, nrows=0).columns
+    usecols = [col for col in _READ_COLS if col in header]
+    df = pd.read_csv(input_file, engine='pyarrow', usecols=usecols)
     
     os.makedirs(output_dir, exist_ok=True)
-    for i, row in tqdm(df.iterrows(), total=len(df), desc="Creating corpus"):
-        doc = {
-            "id": str(i),
-            "contents": row['document'],
-            "title": row['title'],
-            "ingredients": row.get('ner_text', ''),
-        }
-        
-        with open(os.path.join(output_dir, f"doc{i}.json"), 'w') as f:
-            json.dump(doc, f)
+    # JsonCollection also reads .json, so doc{i}.json files from older runs would be indexed twice
+    for name in os.listdir(output_dir):
+        if name.endswith('.json'):
+            os.remove(os.path.join(output_dir, name))
+    # Missing text would otherwise be written as JSON null
+    titles = df['title'].fillna('').to_numpy()
+    docs = df['document'].to_numpy()
+    ners = df['ner_text'].fillna('').to_numpy() if 'ner_text' in df else [''] * len(df)
+    
+    # Single JSONL file, JsonCollection indexes every .jsonl in the directory
+    with open(os.path.join(output_dir, "corpus.jsonl"), 'wb', buffering=1 << 16) as f:
+        for i in tqdm(range(len(docs)), desc="Creating corpus", mininterval=0.5):
+            f.write(orjson.dumps({
+                "id": str(i),
+                "contents": docs[i],
+                "title": titles[i],
+                "ingredients": ners[i],
+            }))
+            f.write(b"\n")
     
     print(f"Corpus created: {len(df)} documents in {output_dir}")
 
@@ -71,25 +85,27 @@ def create_placeholder_qrels(queries_file, output_file, num_docs):
         for qid in range(len(queries)):
             f.write(f"{qid + 1} {qid} 1\n")
 
-def main():
-    RECIPES_CSV = "data/recipes_processed.csv"
-    OUTPUT_DIR = "data/recipes"
-    
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+def run(
+    recipes_csv="data/recipes_processed.csv",
+    corpus_dir="data/recipes/corpus",
+    queries_file="data/recipes/recipes-queries.txt",
+    qrels_file="data/recipes/recipes-qrels.txt",
+):
+    os.makedirs(os.path.dirname(queries_file), exist_ok=True)
     
-    corpus_dir = os.path.join(OUTPUT_DIR, "corpus")
-    queries_file = os.path.join(OUTPUT_DIR, "recipes-queries.txt")
-    qrels_file = os.path.join(OUTPUT_DIR, "recipes-qrels.txt")
-    
-    if not os.path.exists(RECIPES_CSV):
-        print(f" Error: {RECIPES_CSV} not found")
+    if not os.path.exists(recipes_csv):
+        print(f" Error: {recipes_csv} not found")
         print("Please run recipe_preprocessing.py first")
-        return
+        return False
     
-    create_corpus(RECIPES_CSV, corpus_dir)
+    create_corpus(recipes_csv, corpus_dir)
     create_sample_queries(queries_file)
-    df = pd.read_csv(RECIPES_CSV)
+    df = pd.read_csv(recipes_csv, engine='pyarrow', usecols=['title'])
     create_placeholder_qrels(queries_file, qrels_file, len(df))
+    return True
+
+def main():
+    run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def top_n_positions(values, n):
+    # Partition instead of a full sort; everything tied with the n-th value stays a
+    # candidate so ties resolve to the earliest rows, as DataFrame.nlargest does.
+    # argpartition would rank NaN highest, so NaNs are set aside and, like nlargest,
+    # only fill in when there are fewer than n real values
+    missing = np.isnan(values)
+    idx = np.flatnonzero(~missing)
+    if len(idx) > n:
+        valid = values[idx]
+        threshold = valid[np.argpartition(valid, -n)[-n:]].min()
+        idx = idx[valid >= threshold]
+    ranked = idx[np.argsort(-values[idx], kind='stable')]
+    return np.concatenate([ranked, np.flatnonzero(missing)])[:n]
@@ -1,7 +1,38 @@
 import pandas as pd
 import numpy as np
+import os
 import re
 import ast
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+
+_RE_WS = re.compile(r'\s+')
+_RE_PUNCT = re.compile(r'[^\w\s.,!?-]')
+PARALLEL_MIN_ROWS = 20_000
+# Every raw column is text; Arrow storage keeps them as contiguous UTF-8 buffers
+STR_DTYPE = 'string[pyarrow]'
+
+
+def parse_list(text):
+    # Recipe NLG stores list columns as JSON; literal_eval only for Python reprs
+    try:
+        parsed = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        try:
+            parsed = ast.literal_eval(text)
+        except Exception:
+            return None
+    return parsed if isinstance(parsed, list) else None
+
+
+def _parse_list_columns(df):
+    out = pd.DataFrame(index=df.index)
+    out['ingredients_list'] = df['ingredients'].apply(RecipePreprocessor.parse_list_field)
+    out['ingredients_text'] = out['ingredients_list'].str.join(' ')
+    out['ner_list'] = df['NER'].apply(RecipePreprocessor.parse_list_field)
+    out['ner_text'] = out['ner_list'].str.join(' ')
+    return out
+
 
 class RecipePreprocessor:
     def __init__(self, data_path):
@@ -18,10 +49,10 @@ class RecipePreprocessor:
                 total - sample_size, 
                 replace=False
             )
-            self.df = pd.read_csv(self.data_path, skiprows=skip)
+            self.df = pd.read_csv(self.data_path, skiprows=skip, dtype=STR_DTYPE)
             print(f"Loaded sample of {len(self.df)} recipes")
         else:
-            self.df = pd.read_csv(self.data_path)
+            self.df = pd.read_csv(self.data_path, engine='pyarrow', dtype=STR_DTYPE)
             print(f"Loaded {len(self.df)} recipes")
             
         return self
@@ -44,50 +75,58 @@ class RecipePreprocessor:
             return ""
         
         text = str(text)
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'[^\w\s.,!?-]', '', text)
+        text = _RE_WS.sub(' ', text)
+        text = _RE_PUNCT.sub('', text)
         text = text.strip()
         
         return text.lower()
     
-    def parse_list_field(self, field):
+    def clean_column(self, series):
+        # Compiled patterns keep Python's Unicode \w and \s; Arrow's RE2 kernels are ASCII-only
+        return (
+            series.fillna('').astype(STR_DTYPE)
+            .str.replace(_RE_WS, ' ', regex=True)
+            .str.replace(_RE_PUNCT, '', regex=True)
+            .str.strip()
+            .str.lower()
+        )
+    
+    @staticmethod
+    def parse_list_field(field):
         if pd.isna(field):
             return []
-        try:
-            parsed = ast.literal_eval(str(field))
-            if isinstance(parsed, list):
-                return [str(item).strip() for item in parsed]
-        except:
-            pass
+        parsed = parse_list(str(field))
+        if parsed is not None:
+            return [str(item).strip() for item in parsed]
         return [item.strip() for item in str(field).split(',')]
     
     def process_recipes(self):
         print("Processing recipes")
         
         print("Cleaning titles")
-        self.df['title_clean'] = self.df['title'].apply(self.clean_text)
+        self.df['title_clean'] = self.clean_column(self.df['title'])
         
-        self.df['ingredients_list'] = self.df['ingredients'].apply(self.parse_list_field)
-        self.df['ingredients_text'] = self.df['ingredients_list'].apply(
-            lambda x: ' '.join(x) if x else ""
-        )
-        
-        self.df['ner_list'] = self.df['NER'].apply(self.parse_list_field)
-        self.df['ner_text'] = self.df['ner_list'].apply(
-            lambda x: ' '.join(x) if x else ""
-        )
+        print("Parsing ingredient lists")
+        list_cols = self.df[['ingredients', 'NER']]
+        if len(list_cols) > PARALLEL_MIN_ROWS:
+            # Only the two raw list columns are shipped to the workers
+            size = -(-len(list_cols) // (os.cpu_count() or 1))
+            chunks = [list_cols.iloc[i:i + size] for i in range(0, len(list_cols), size)]
+            with ProcessPoolExecutor() as executor:
+                parsed = pd.concat(executor.map(_parse_list_columns, chunks))
+        else:
+            parsed = _parse_list_columns(list_cols)
+        self.df = self.df.join(parsed)
         
-        self.df['directions_clean'] = self.df['directions'].apply(self.clean_text)
+        self.df['directions_clean'] = self.clean_column(self.df['directions'])
         
         print("Creating combined document field")
-        self.df['document'] = (
-            self.df['title_clean'] + ' ' + 
-            self.df['ner_text'] + ' ' +
-            self.df['directions_clean']
+        self.df['document'] = self.df['title_clean'].str.cat(
+            [self.df['ner_text'], self.df['directions_clean']], sep=' ', na_rep=''
         ).str.strip()
         
         before = len(self.df)
-        self.df = self.df[self.df['document'].str.len() > 0]
+        self.df = self.df.loc[self.df['document'].str.len().to_numpy() > 0]
         dropped = before - len(self.df)
         if dropped > 0:
             print(f"Removed {dropped} recipes with empty content")
@@ -127,21 +166,22 @@ class RecipePreprocessor:
         return output_path
 
 
-def main():
-    INPUT_FILE = "data/recipes_data.csv"
-    OUTPUT_FILE = "data/recipes_processed.csv"
-    SAMPLE_SIZE = 10000
-    
+def run(input_file="data/recipes_data.csv", output_file="data/recipes_processed.csv", sample_size=10000):
     print("Data Preprocessing:")
-    preprocessor = RecipePreprocessor(INPUT_FILE)
+    preprocessor = RecipePreprocessor(input_file)
     
-    preprocessor.load_data(sample_size=SAMPLE_SIZE)
+    preprocessor.load_data(sample_size=sample_size)
     preprocessor.explore_data()
     preprocessor.process_recipes()
     preprocessor.get_statistics()
-    preprocessor.save_processed_data(OUTPUT_FILE)
+    preprocessor.save_processed_data(output_file)
     
     print("Preprocessing complete")
+    return True
+
+
+def main():
+    run()
 
 if __name__ == "__main__":
     main()
@@ -1,26 +1,46 @@
 import os
 import json
-from tqdm import tqdm
+import orjson
 from pyserini.search.lucene import LuceneSearcher
 import numpy as np
+import pandas as pd
+import shutil
 import subprocess
 
+def index_committed(index_dir):
+    # Lucene writes segments_N when an index is committed
+    return os.path.isdir(index_dir) and any(
+        name.startswith("segments_") for name in os.listdir(index_dir)
+    )
+
 def build_index(input_dir, index_dir):
-    if os.path.exists(index_dir) and os.listdir(index_dir):
+    if index_committed(index_dir):
         print(f"Index already exists at {index_dir}")
         return
     
     print(f"Building index from {input_dir}")
-    cmd = [
-        "python", "-m", "pyserini.index.lucene",
+    args = [
         "--collection", "JsonCollection",
         "--input", input_dir,
         "--index", index_dir,
         "--generator", "DefaultLuceneDocumentGenerator",
-        "--threads", "1",
-        "--storePositions", "--storeDocvectors", "--storeRaw"
+        "--threads", str(os.cpu_count() or 4),
+        # Only the raw JSON is read back (doc().raw()); positions and docvectors went unused
+        "--storeRaw"
     ]
-    subprocess.run(cmd, check=True)
+    try:
+        # Same entry point as `python -m pyserini.index.lucene`, on the JVM the searchers reuse
+        from pyserini.pyclass import autoclass
+        autoclass('io.anserini.index.IndexCollection').main(args)
+        # main() prints usage and returns normally on bad arguments, so check for the index itself
+        if not index_committed(index_dir):
+            raise RuntimeError("IndexCollection returned without writing an index")
+    except Exception as e:
+        print(f"In-process indexing failed ({e}), retrying with the pyserini CLI")
+        shutil.rmtree(index_dir, ignore_errors=True)
+        subprocess.run(["python", "-m", "pyserini.index.lucene", *args], check=True)
+        if not index_committed(index_dir):
+            raise RuntimeError(f"Indexing finished without writing an index to {index_dir}")
     print("Index built successfully")
 
 def load_queries(query_file):
@@ -29,132 +49,117 @@ def load_queries(query_file):
     print(f"Loaded {len(queries)} queries")
     return queries
 
-def load_qrels(qrels_file):
-    qrels = {}
-    with open(qrels_file, 'r') as f:
+def load_qrels(qrels_file, rel_threshold=1):
+    qrels = pd.read_csv(
+        qrels_file, sep=r'\s+', header=None, names=['qid', 'docid', 'rel'],
+        dtype={'qid': str, 'docid': str}, on_bad_lines='skip',
+    ).dropna()
+    # A repeated judgment overrides the earlier one
+    qrels = qrels.drop_duplicates(['qid', 'docid'], keep='last')
+    # Judged queries keep an entry even when nothing clears the threshold
+    rel_sets = dict.fromkeys(qrels['qid'].unique(), frozenset())
+    relevant = qrels[qrels['rel'] >= rel_threshold]
+    rel_sets.update(relevant.groupby('qid')['docid'].agg(frozenset).to_dict())
+    print(f"Loaded qrels for {len(rel_sets)} queries")
+    return rel_sets
+
+def batch_search(searcher, queries, out_path, top_k=10, query_id_start=1, batch_size=1000):
+    # Hits go to disk one batch at a time; only a batch's worth is ever held in memory
+    threads = os.cpu_count() or 1
+    with open(out_path, 'wb') as f:
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            qids = [str(i + query_id_start) for i in range(start, start + len(batch))]
+            hits_map = searcher.batch_search(batch, qids, k=top_k, threads=threads)
+            f.write(b''.join(
+                orjson.dumps({'qid': qid, 'hits': [(hit.docid, hit.score) for hit in hits_map[qid]]}) + b'\n'
+                for qid in qids
+            ))
+    return out_path
+
+def read_results(results_path):
+    with open(results_path, 'rb') as f:
         for line in f:
-            parts = line.strip().split()
-            if len(parts) != 3:
-                continue
-            qid, docid, rel = parts
-            if qid not in qrels:
-                qrels[qid] = {}
-            qrels[qid][docid] = int(rel)
-    print(f"Loaded qrels for {len(qrels)} queries")
-    return qrels
+            record = orjson.loads(line)
+            yield record['qid'], record['hits']
 
-def search_tfidf(searcher, queries, top_k=10, query_id_start=1):
+def search_tfidf(searcher, queries, out_path, top_k=10, query_id_start=1):
     searcher.set_bm25(k1=0, b=0)
-    results = {}
-    for i, query in enumerate(tqdm(queries, desc="Searching with TF-IDF")):
-        qid = str(i + query_id_start)
-        hits = searcher.search(query, k=top_k)
-        results[qid] = [(hit.docid, hit.score) for hit in hits]
-    return results
+    print(f"Searching with TF-IDF ({len(queries)} queries)")
+    return batch_search(searcher, queries, out_path, top_k=top_k, query_id_start=query_id_start)
 
-def search_bm25(searcher, queries, top_k=10, query_id_start=1, k1=1.2, b=0.75):
+def search_bm25(searcher, queries, out_path, top_k=10, query_id_start=1, k1=1.2, b=0.75):
     searcher.set_bm25(k1=k1, b=b)
-    results = {}
-    for i, query in enumerate(tqdm(queries, desc="Searching with BM25")):
-        qid = str(i + query_id_start)
-        hits = searcher.search(query, k=top_k)
-        results[qid] = [(hit.docid, hit.score) for hit in hits]
-    return results
+    print(f"Searching with BM25 ({len(queries)} queries)")
+    return batch_search(searcher, queries, out_path, top_k=top_k, query_id_start=query_id_start)
 
-def compute_precision_at_k(results, qrels, k=10, rel_threshold=1):
-    precision_scores = []
-    for qid, query_results in results.items():
-        if qid not in qrels:
+def compute_metrics(results_path, rel_sets, k=10):
+    # Streams the hit file once; only one query's top-k is in memory at a time
+    ranks = np.arange(1, k + 1)
+    precision_sum = recall_sum = ap_sum = 0.0
+    n_precision = n_recall = n_ap = 0
+    for qid, hits in read_results(results_path):
+        if qid not in rel_sets:
             continue
-        topk = query_results[:k]
-        relevances = [
-            1 if qrels[qid].get(docid, 0) >= rel_threshold else 0
-            for docid, _ in topk
-        ]
-        if relevances:
-            precision_scores.append(sum(relevances) / k)
-    return np.mean(precision_scores) if precision_scores else 0.0
-
-def compute_recall_at_k(results, qrels, k=10, rel_threshold=1):
-    recall_scores = []
-    for qid, query_results in results.items():
-        if qid not in qrels:
-            continue
-        
-        total_relevant = sum(1 for rel in qrels[qid].values() if rel >= rel_threshold)
-        if total_relevant == 0:
-            continue
-            
-        topk = query_results[:k]
-        retrieved_relevant = sum(
-            1 for docid, _ in topk if qrels[qid].get(docid, 0) >= rel_threshold
-        )
-        
-        recall_scores.append(retrieved_relevant / total_relevant)
-    
-    return np.mean(recall_scores) if recall_scores else 0.0
-
-def compute_map(results, qrels, k=10):
-    ap_scores = []
-    for qid, query_results in results.items():
-        if qid not in qrels:
-            continue
-        
-        relevances = [qrels[qid].get(docid, 0) for docid, _ in query_results[:k]]
-        num_relevant = 0
-        sum_precisions = 0.0
+        relevant = rel_sets[qid]
+        topk = hits[:k]
+        rel = np.fromiter((docid in relevant for docid, _ in topk), dtype=np.int8, count=len(topk))
+        retrieved_relevant = int(rel.sum())
         
-        for i, rel in enumerate(relevances, 1):
-            if rel > 0:
-                num_relevant += 1
-                precision_at_i = num_relevant / i
-                sum_precisions += precision_at_i
-        
-        if num_relevant > 0:
-            ap_scores.append(sum_precisions / num_relevant)
+        if topk:
+            precision_sum += retrieved_relevant / k
+            n_precision += 1
+        if relevant:
+            recall_sum += retrieved_relevant / len(relevant)
+            n_recall += 1
+        if retrieved_relevant:
+            ap_sum += (rel.cumsum() * rel / ranks[:len(rel)]).sum() / retrieved_relevant
+            n_ap += 1
     
-    return np.mean(ap_scores) if ap_scores else 0.0
+    return {
+        'precision@k': precision_sum / n_precision if n_precision else 0.0,
+        'recall@k': recall_sum / n_recall if n_recall else 0.0,
+        'MAP': ap_sum / n_ap if n_ap else 0.0,
+    }
 
-def print_sample_results(searcher, results, queries, n_queries=3, n_results=5):
+def print_sample_results(searcher, results_path, queries, n_queries=3, n_results=5):
     print("SAMPLE SEARCH RESULTS")
+    # The same recipes show up under several queries; decode each stored doc once
+    title_cache = {}
     
-    for i in range(min(n_queries, len(queries))):
-        qid = str(i + 1)
-        query = queries[i]
+    # Result lines are in query order, so the first few lines are the first few queries
+    for query, (qid, hits) in zip(queries[:n_queries], read_results(results_path)):
         print(f"\nQuery {qid}: \"{query}\"")
         print("-" * 80)
         
-        if qid in results:
-            for rank, (docid, score) in enumerate(results[qid][:n_results], 1):
-                doc = json.loads(searcher.doc(docid).raw())
-                title = doc.get('title', 'No title')
-                print(f"{rank}. {title}")
-                print(f"   Score: {score:.4f}")
+        for rank, (docid, score) in enumerate(hits[:n_results], 1):
+            if docid not in title_cache:
+                doc = orjson.loads(searcher.doc(docid).raw())
+                title_cache[docid] = doc.get('title') or 'No title'
+            print(f"{rank}. {title_cache[docid]}")
+            print(f"   Score: {score:.4f}")
         print()
 
-def compare_retrieval_algorithms(index_dir, queries, qrels, top_k=10, query_id_start=1):
+def compare_retrieval_algorithms(index_dir, queries, rel_sets, top_k=10, query_id_start=1, results_dir="data/recipes"):
     print("COMPARING RETRIEVAL ALGORITHMS: TF-IDF vs BM25")
     searcher = LuceneSearcher(index_dir)
+    os.makedirs(results_dir, exist_ok=True)
     
     print("\n[1/2] Running TF-IDF retrieval")
-    tfidf_results = search_tfidf(searcher, queries, top_k=top_k, query_id_start=query_id_start)
+    tfidf_results = search_tfidf(
+        searcher, queries, os.path.join(results_dir, "tfidf_results.jsonl"),
+        top_k=top_k, query_id_start=query_id_start,
+    )
     
-    tfidf_metrics = {
-        'name': 'TF-IDF',
-        'precision@k': compute_precision_at_k(tfidf_results, qrels, k=top_k),
-        'recall@k': compute_recall_at_k(tfidf_results, qrels, k=top_k),
-        'MAP': compute_map(tfidf_results, qrels, k=top_k)
-    }
+    tfidf_metrics = {'name': 'TF-IDF', **compute_metrics(tfidf_results, rel_sets, k=top_k)}
     
     print("\n[2/2] Running BM25 retrieval")
-    bm25_results = search_bm25(searcher, queries, top_k=top_k, query_id_start=query_id_start)
+    bm25_results = search_bm25(
+        searcher, queries, os.path.join(results_dir, "bm25_results.jsonl"),
+        top_k=top_k, query_id_start=query_id_start,
+    )
     
-    bm25_metrics = {
-        'name': 'BM25',
-        'precision@k': compute_precision_at_k(bm25_results, qrels, k=top_k),
-        'recall@k': compute_recall_at_k(bm25_results, qrels, k=top_k),
-        'MAP': compute_map(bm25_results, qrels, k=top_k)
-    }
+    bm25_metrics = {'name': 'BM25', **compute_metrics(bm25_results, rel_sets, k=top_k)}
     
     print("RESULTS SUMMARY")
     print(f"\n{'Algorithm':<15} {'Precision@'+str(top_k):<20} {'Recall@'+str(top_k):<20} {'MAP':<10}")
@@ -170,20 +175,22 @@ def compare_retrieval_algorithms(index_dir, queries, qrels, top_k=10, query_id_s
         'bm25_results': bm25_results
     }
 
-def main():
-    BASE_DIR = "data/recipes"
-    CORPUS_DIR = os.path.join(BASE_DIR, "corpus")
-    INDEX_DIR = "indices/recipes_lucene"
-    QUERIES_FILE = os.path.join(BASE_DIR, "recipes-queries.txt")
-    QRELS_FILE = os.path.join(BASE_DIR, "recipes-qrels.txt")
-    
-    build_index(CORPUS_DIR, INDEX_DIR)
-    
-    queries = load_queries(QUERIES_FILE)
-    qrels = load_qrels(QRELS_FILE)
-    
+def run(
+    corpus_dir="data/recipes/corpus",
+    index_dir="indices/recipes_lucene",
+    queries_file="data/recipes/recipes-queries.txt",
+    qrels_file="data/recipes/recipes-qrels.txt",
+    output_file="retrieval_comparison_results.json",
+    results_dir="data/recipes",
+):
+    build_index(corpus_dir, index_dir)
+    
+    queries = load_queries(queries_file)
+    rel_sets = load_qrels(qrels_file)
+    
+    # The per-query hit lists go to results_dir alongside the queries and qrels
     comparison = compare_retrieval_algorithms(
-        INDEX_DIR, queries, qrels, top_k=10, query_id_start=1
+        index_dir, queries, rel_sets, top_k=10, query_id_start=1, results_dir=results_dir,
     )
     
     output = {
@@ -192,14 +199,18 @@ def main():
             "bm25": comparison['bm25']
         },
         "num_queries": len(queries),
-        "num_qrels": len(qrels),
+        "num_qrels": len(rel_sets),
         "evaluation_metric": "k=10"
     }
     
-    with open("retrieval_comparison_results.json", 'w') as f:
+    with open(output_file, 'w') as f:
         json.dump(output, f, indent=2)
     
-    print("Results saved to: retrieval_comparison_results.json")
+    print(f"Results saved to: {output_file}")
+    return True
+
+def main():
+    run()
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,78 @@
 import pandas as pd
-from textblob import TextBlob
+import numpy as np
+# The lexicon scorer behind TextBlob.sentiment, minus the per-text blob construction
+from textblob.en import sentiment as lexicon_sentiment
 from tqdm import tqdm
-import ast
+import os
+import ahocorasick
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from ranking import top_n_positions
+
+# Lexicon scoring dominates the per-row cost, so the pool pays for itself after a few thousand rows
+PARALLEL_MIN_ROWS = 2_000
+STR_DTYPE = 'string[pyarrow]'
+# Everything analyze() and save() touch; all of it is text
+_READ_COLS = ['title', 'ner_text', 'ner_list', 'directions_clean', 'link', 'source']
+
+# Dict order is the cuisine precedence: the first cuisine with any keyword match wins
+CUISINE_KEYWORDS = {
+    'Italian': ['pasta', 'italian', 'parmesan', 'marinara', 'pesto'],
+    'Mexican': ['taco', 'burrito', 'salsa', 'enchilada', 'tortilla'],
+    'Asian': ['stir fry', 'soy sauce', 'ginger', 'sesame', 'thai'],
+    'Indian': ['curry', 'masala', 'tikka', 'naan'],
+    'Mediterranean': ['hummus', 'falafel', 'greek', 'feta', 'olive'],
+    'French': ['french', 'croissant', 'quiche'],
+    'American': ['bbq', 'burger', 'southern', 'cajun'],
+}
+DIET_KEYWORDS = {
+    'Vegan': ['vegan'],
+    'Vegetarian': ['vegetarian', 'veggie'],
+    'Gluten-Free': ['gluten free'],
+    'Keto': ['keto', 'low carb'],
+    'Paleo': ['paleo'],
+    'Poultry': ['chicken', 'turkey'],
+    'Beef': ['beef', 'steak'],
+    'Pork': ['pork', 'bacon'],
+    'Seafood': ['fish', 'salmon', 'shrimp', 'seafood'],
+}
+# Each group contributes at most one tag, the first of its labels that matched
+DIET_GROUPS = [
+    ('Vegan', 'Vegetarian'),
+    ('Gluten-Free',),
+    ('Keto',),
+    ('Paleo',),
+    ('Poultry', 'Beef', 'Pork', 'Seafood'),
+]
+SENTIMENT_LABELS = ['positive', 'neutral', 'negative']
+CUISINE_TYPES = list(CUISINE_KEYWORDS) + ['Other']
+DIETARY_TYPES = list(DIET_KEYWORDS) + ['Standard']
+# One bit per dietary tag in DIETARY_TYPES order (Vegan=1 ... Standard=512)
+DIETARY_BITS = {label: 1 << i for i, label in enumerate(DIETARY_TYPES)}
+# Bitmask -> tag list, in the same order categorize() would list them
+DIETARY_DECODE = [
+    [label for label, bit in DIETARY_BITS.items() if mask & bit]
+    for mask in range(1 << len(DIETARY_TYPES))
+]
+# Bitmask -> DIETARY_TYPES index of its lowest set bit, the primary tag
+DIETARY_PRIMARY = np.array(
+    [(mask & -mask).bit_length() - 1 for mask in range(1 << len(DIETARY_TYPES))], dtype=np.int8
+)
+
+
+def _build_keyword_automaton():
+    automaton = ahocorasick.Automaton()
+    for category, keywords in (('cuisine', CUISINE_KEYWORDS), ('diet', DIET_KEYWORDS)):
+        for label, words in keywords.items():
+            for word in words:
+                automaton.add_word(word, (category, label))
+    automaton.make_automaton()
+    return automaton
+
+
+# One linear scan of the text finds every keyword, including overlapping ones
+KEYWORD_AUTOMATON = _build_keyword_automaton()
+
 
 class SentimentAnalyzer:
     def __init__(self, data_path):
@@ -10,26 +81,24 @@ class SentimentAnalyzer:
         
     def load_data(self):
         print(f"Loading {self.data_path}")
-        self.df = pd.read_csv(self.data_path)
+        # The pyarrow engine rejects usecols that are not in the file, so match them to the header
+        header = pd.read_csv(self.data_path, nrows=0).columns
+        usecols = [col for col in _READ_COLS if col in header]
+        self.df = pd.read_csv(self.data_path, engine='pyarrow', usecols=usecols, dtype=STR_DTYPE)
         print(f"Got {len(self.df):,} recipes")
         
+        # ner_list is only passed through to save(), so it stays as the raw list text
         if 'ner_list' in self.df.columns:
-            try:
-                self.df['ner_list'] = self.df['ner_list'].apply(
-                    lambda x: ast.literal_eval(str(x)) if pd.notna(x) else []
-                )
-            except:
-                pass
+            self.df['ner_list'] = self.df['ner_list'].fillna('[]')
         
         return self
     
-    def get_sentiment(self, text):
+    @staticmethod
+    def get_sentiment(text):
         if pd.isna(text) or not text:
             return 0.0, 0.0, 'neutral'
         
-        blob = TextBlob(str(text))
-        polarity = blob.sentiment.polarity
-        subjectivity = blob.sentiment.subjectivity
+        polarity, subjectivity = lexicon_sentiment(str(text))
         
         if polarity > 0.1:
             return polarity, subjectivity, 'positive'
@@ -38,80 +107,71 @@ class SentimentAnalyzer:
         else:
             return polarity, subjectivity, 'neutral'
     
-    def categorize_cuisine(self, title, ingredients):
-        text = f"{title} {ingredients}".lower()
-        
-        if any(word in text for word in ['pasta', 'italian', 'parmesan', 'marinara', 'pesto']):
-            return 'Italian'
-        if any(word in text for word in ['taco', 'burrito', 'salsa', 'enchilada', 'tortilla']):
-            return 'Mexican'
-        if any(word in text for word in ['stir fry', 'soy sauce', 'ginger', 'sesame', 'thai']):
-            return 'Asian'
-        if any(word in text for word in ['curry', 'masala', 'tikka', 'naan']):
-            return 'Indian'
-        if any(word in text for word in ['hummus', 'falafel', 'greek', 'feta', 'olive']):
-            return 'Mediterranean'
-        if any(word in text for word in ['french', 'croissant', 'quiche']):
-            return 'French'
-        if any(word in text for word in ['bbq', 'burger', 'southern', 'cajun']):
-            return 'American'
-        
-        return 'Other'
+    @staticmethod
+    def categorize(text):
+        cuisines, diets = set(), set()
+        for _, (category, label) in KEYWORD_AUTOMATON.iter(text):
+            (cuisines if category == 'cuisine' else diets).add(label)
+        
+        cuisine = next((c for c in CUISINE_KEYWORDS if c in cuisines), 'Other')
+        bits = 0
+        for group in DIET_GROUPS:
+            label = next((label for label in group if label in diets), None)
+            if label:
+                bits |= DIETARY_BITS[label]
+        return cuisine, bits or DIETARY_BITS['Standard']
     
-    def categorize_diet(self, title, ingredients):
-        text = f"{title} {ingredients}".lower()
-        tags = []
-        
-        if 'vegan' in text:
-            tags.append('Vegan')
-        elif 'vegetarian' in text or 'veggie' in text:
-            tags.append('Vegetarian')
-        
-        if 'gluten free' in text:
-            tags.append('Gluten-Free')
-        if 'keto' in text or 'low carb' in text:
-            tags.append('Keto')
-        if 'paleo' in text:
-            tags.append('Paleo')
-        
-        if 'chicken' in text or 'turkey' in text:
-            tags.append('Poultry')
-        elif 'beef' in text or 'steak' in text:
-            tags.append('Beef')
-        elif 'pork' in text or 'bacon' in text:
-            tags.append('Pork')
-        elif any(word in text for word in ['fish', 'salmon', 'shrimp', 'seafood']):
-            tags.append('Seafood')
-        
-        return tags if tags else ['Standard']
+    def column_values(self, name):
+        if name in self.df.columns:
+            return self.df[name].to_numpy()
+        return np.full(len(self.df), '', dtype=object)
     
     def analyze(self):
         print("\nAnalyzing recipes")
         
-        polarities = []
-        subjectivities = []
-        labels = []
-        cuisines = []
-        dietaries = []
-        
-        for idx, row in tqdm(self.df.iterrows(), total=len(self.df)):
-            polarity, subjectivity, label = self.get_sentiment(row.get('directions_clean', ''))
-            polarities.append(polarity)
-            subjectivities.append(subjectivity)
-            labels.append(label)
-            
-            cuisine = self.categorize_cuisine(row.get('title', ''), row.get('ner_text', ''))
-            cuisines.append(cuisine)
-            
-            dietary = self.categorize_diet(row.get('title', ''), row.get('ner_text', ''))
-            dietaries.append(dietary)
+        texts = self.column_values('directions_clean')
+        titles = self.column_values('title')
+        ingredients = self.column_values('ner_text')
+        
+        # Directions repeat across recipes, so each distinct text is scored once
+        codes, unique_texts = pd.factorize(texts)
+        workers = os.cpu_count() or 1
+        if workers > 1 and len(unique_texts) > PARALLEL_MIN_ROWS:
+            # Spawned, not forked: under main.py --full the Pyserini JVM's threads already live in this process.
+            # Large chunks keep pickling overhead small relative to the scoring work
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                scores = list(tqdm(
+                    pool.map(SentimentAnalyzer.get_sentiment, unique_texts, chunksize=512),
+                    total=len(unique_texts),
+                ))
+        else:
+            scores = [self.get_sentiment(text) for text in tqdm(unique_texts)]
+        # Missing texts are coded -1, which picks up this trailing neutral score
+        scores.append(self.get_sentiment(None))
+        
+        polarities = [scores[code][0] for code in codes]
+        subjectivities = [scores[code][1] for code in codes]
+        labels = [scores[code][2] for code in codes]
+        
+        # Categories depend only on title + ingredients, and recipe corpora repeat those a lot
+        combined = pd.Series(titles, dtype=STR_DTYPE).fillna('').str.cat(
+            pd.Series(ingredients, dtype=STR_DTYPE).fillna(''), sep=' '
+        )
+        key_codes, unique_keys = pd.factorize(combined)
+        categories = [self.categorize(text.lower()) for text in unique_keys]
+        cuisines = np.array([cuisine for cuisine, _ in categories], dtype=object)[key_codes]
+        dietary_bits = np.array([bits for _, bits in categories], dtype=np.uint16)[key_codes]
         
         self.df['sentiment_polarity'] = polarities
         self.df['sentiment_subjectivity'] = subjectivities
-        self.df['sentiment_label'] = labels
-        self.df['cuisine_type'] = cuisines
-        self.df['dietary_categories'] = dietaries
-        self.df['primary_dietary'] = [diet[0] for diet in dietaries]
+        # Fixed category sets, so the groupbys below work on small integer codes
+        self.df['sentiment_label'] = pd.Categorical(labels, categories=SENTIMENT_LABELS)
+        self.df['cuisine_type'] = pd.Categorical(cuisines, categories=CUISINE_TYPES)
+        self.df['dietary_bits'] = dietary_bits
+        self.df['primary_dietary'] = pd.Categorical.from_codes(
+            DIETARY_PRIMARY[dietary_bits], categories=DIETARY_TYPES
+        )
         return self
     
     def show_stats(self):
@@ -123,23 +183,25 @@ class SentimentAnalyzer:
         print(f"Avg subjectivity: {avg_subjectivity:.3f}")
         
         print("\nSentiment breakdown:")
-        for label in ['positive', 'neutral', 'negative']:
+        for label in SENTIMENT_LABELS:
             count = (self.df['sentiment_label'] == label).sum()
             pct = count / len(self.df) * 100
             print(f"{label}: {count:,} ({pct:.1f}%)")
         
         print("\nTop 5 cuisines:")
-        for cuisine, count in self.df['cuisine_type'].value_counts().head(5).items():
+        cuisine_counts = self.df['cuisine_type'].value_counts()
+        for cuisine, count in cuisine_counts[cuisine_counts > 0].head(5).items():
             print(f"{cuisine}: {count:,}")
         
         print("\nTop 5 dietary types:")
-        for diet, count in self.df['primary_dietary'].value_counts().head(5).items():
+        diet_counts = self.df['primary_dietary'].value_counts()
+        for diet, count in diet_counts[diet_counts > 0].head(5).items():
             print(f"{diet}: {count:,}")
     
     def show_by_cuisine(self):
         print("\nCuisine Analysis\n")
         
-        stats = self.df.groupby('cuisine_type')['sentiment_polarity'].agg(['mean', 'count'])
+        stats = self.df.groupby('cuisine_type', observed=True)['sentiment_polarity'].agg(['mean', 'count'])
         stats = stats.sort_values('mean', ascending=False)
         
         print(f"\n{'Cuisine':<20} {'Avg':<10} {'Count':<10}")
@@ -152,7 +214,7 @@ class SentimentAnalyzer:
     def show_by_dietary(self):
         print("\nDietary Type:\n")
         
-        stats = self.df.groupby('primary_dietary')['sentiment_polarity'].agg(['mean', 'count'])
+        stats = self.df.groupby('primary_dietary', observed=True)['sentiment_polarity'].agg(['mean', 'count'])
         stats = stats.sort_values('mean', ascending=False)
         
         print(f"\n{'Type':<20} {'Avg':<10} {'Count':<10}\n")
@@ -164,7 +226,7 @@ class SentimentAnalyzer:
     def show_top(self, n=3):
         print(f"\nTop {n} Recipes\n")
         
-        top = self.df.nlargest(n, 'sentiment_polarity')
+        top = self.df.iloc[top_n_positions(self.df['sentiment_polarity'].to_numpy(), n)]
         for idx, row in top.iterrows():
             print(f"\n{row['title']}")
             print(f"Score: {row['sentiment_polarity']:.3f}")
@@ -180,20 +242,25 @@ class SentimentAnalyzer:
             if col in self.df.columns:
                 keep_cols.append(col)
         
-        self.df[keep_cols].to_csv(output_path, index=False)
+        # The output keeps the readable tag lists; only the bitmask lives in memory
+        output = self.df.assign(
+            dietary_categories=[DIETARY_DECODE[bits] for bits in self.df['dietary_bits'].to_numpy()]
+        )
+        output[keep_cols].to_csv(output_path, index=False)
 
-def main():
-    INPUT = "data/recipes_processed.csv"
-    OUTPUT = "data/recipes_sentiment.csv"
-    
-    analyzer = SentimentAnalyzer(INPUT)
+def run(input_file="data/recipes_processed.csv", output_file="data/recipes_sentiment.csv"):
+    analyzer = SentimentAnalyzer(input_file)
     analyzer.load_data()
     analyzer.analyze()
     analyzer.show_stats()
     analyzer.show_by_cuisine()
     analyzer.show_by_dietary()
     analyzer.show_top(n=3)
-    analyzer.save(OUTPUT)
+    analyzer.save(output_file)
+    return True
+
+def main():
+    run()
 
 if __name__ == "__main__":
     main()